@@ -2,7 +2,10 @@
 This module simplifies the creation of click options from settings and type schemes.
 """
 
+import atexit
+import functools
 import logging
+import operator
 import traceback
 import warnings
 
@@ -18,6 +21,123 @@ from temci.utils.typecheck import Obsolete
 from temci.utils.util import sphinx_doc
 
 
+_TYPE_SCHEME_RAW_CACHE = {}  # type: t.Dict[int, t.Tuple[Type, t.Any, bool]]
+""" Raw click type and multiplicity of already processed type schemes, keyed by the id of the type scheme
+(the type scheme itself is stored too, to detect reused ids) """
+
+
+@functools.lru_cache(maxsize=None)
+def _cached_choice(values: tuple) -> click.Choice:
+    return click.Choice(list(values))
+
+
+def _choice(values: tuple) -> click.Choice:
+    """
+    Returns a click choice type for the passed values, shared between all options with the same values.
+    Unhashable values (e.g. lists) get their own uncached choice type.
+
+    :param values: allowed values
+    """
+    try:
+        return _cached_choice(values)
+    except TypeError:
+        return click.Choice(list(values))
+
+
+_UNWRAP_TYPES = (Constraint, NonErrorConstraint)
+""" Type scheme classes that wrap the actually used type scheme """
+
+_STR = Str()
+_STR_OR_NONE = Str() | E(None)
+_LIST_STR = List(Str())
+""" Type schemes used for the type checks in this module, created only once """
+
+_PLUGIN_KEY_SUFFIXES = ("_active", "_misc")
+""" Suffixes of the settings keys that belong to plugins """
+
+_UNDOCUMENTED = set()  # type: t.Set[str]
+""" Names of the undocumented options, reported in a single warning at exit """
+
+
+def _warn_about_undocumented_options():
+    """
+    Emits one warning for all options without documentation.
+    """
+    if _UNDOCUMENTED:
+        warnings.warn("Options without documentation: {}".format(", ".join(sorted(_UNDOCUMENTED))))
+
+
+atexit.register(_warn_about_undocumented_options)
+
+_VALIDATOR_CACHE = {}  # type: t.Dict[int, t.Tuple[Type, t.Callable[[click.Context, str, t.Any], t.Any]]]
+""" Validator functions created by validate, keyed by the id of the validated type scheme """
+
+
+@functools.lru_cache(maxsize=None)
+def _cached_type_scheme(key: str) -> Type:
+    """
+    Returns the type scheme of the passed settings key.
+    The result is cached until the type scheme of the settings is modified.
+
+    :param key: settings key
+    :raises: SettingsError if the setting with the given key doesn't exist
+    """
+    return Settings().get_type_scheme(key)
+
+
+def clear_type_scheme_caches():
+    """
+    Clears all caches that depend on the settings type scheme.
+    Called by the Settings object whenever its type scheme is modified or reset.
+    """
+    _cached_type_scheme.cache_clear()
+    _TYPE_SCHEME_RAW_CACHE.clear()
+    _VALIDATOR_CACHE.clear()
+
+
+def _first_line(type_scheme: Type) -> str:
+    """
+    Returns the first line of the description of the passed type scheme.
+    The result is cached on the type scheme and recomputed if the description changes.
+
+    :param type_scheme: passed type scheme
+    """
+    description = type_scheme.description
+    cached = getattr(type_scheme, "_first_line_cache", None)
+    if cached is None or cached[0] is not description:
+        cached = (description, (description or "").strip().split("\n", 1)[0])
+        type_scheme._first_line_cache = cached
+    return cached[1]
+
+
+class _ChainedCallback:
+    """
+    Click callback that passes the value through an optional inner callback and then through the outer callback.
+    """
+
+    __slots__ = ("inner", "outer", "validate_settings")
+
+    def __init__(self, inner: t.Optional[t.Callable[[click.Context, click.Option, t.Any], t.Any]],
+                 outer: t.Callable[[click.Context, click.Option, t.Any], t.Any], validate_settings: bool = False):
+        """
+        Creates an instance.
+
+        :param inner: callback that is called first (if not None)
+        :param outer: callback that gets the result of the inner callback
+        :param validate_settings: call Settings().validate() before the callbacks
+        """
+        self.inner = inner
+        self.outer = outer
+        self.validate_settings = validate_settings
+
+    def __call__(self, ctx: click.Context, param: click.Option, value: t.Any) -> t.Any:
+        if self.validate_settings:
+            Settings().validate()
+        if self.inner is not None:
+            value = self.inner(ctx, param, value)
+        return self.outer(ctx, param, value)
+
+
 def type_scheme_option(option_name: str, type_scheme: Type, is_flag: bool = False,
                        callback = t.Callable[[click.Context, str, t.Any], t.Any], short: str = None, with_default: bool = True,
                        default = None, validate_settings: bool = False) -> t.Callable[[t.Callable], t.Callable]:
@@ -47,7 +167,7 @@ def type_scheme_option(option_name: str, type_scheme: Type, is_flag: bool = Fals
             has_default = False
 
     def raw_type(_type):
-        while isinstance(_type, Constraint) or isinstance(_type, NonErrorConstraint):
+        while isinstance(_type, _UNWRAP_TYPES):
             _type = _type.constrained_type
         if not isinstance(_type, Type):
             return _type
@@ -62,24 +182,21 @@ def type_scheme_option(option_name: str, type_scheme: Type, is_flag: bool = Fals
         else:
             raise ValueError("type scheme {} (option {}) is not annotatable".format(str(type_scheme), option_name))
 
-    def func(decorated_func):
-        used_raw_type = None
+    def resolve_raw_type(type_scheme: Type) -> t.Tuple[t.Any, bool]:
         multiple = False
-        type_scheme = __type_scheme
-        _type_scheme = type_scheme
         while isinstance(type_scheme, Either):
             type_scheme = type_scheme.types[0]
-        while isinstance(type_scheme, Constraint) or isinstance(type_scheme, NonErrorConstraint):
+        while isinstance(type_scheme, _UNWRAP_TYPES):
             type_scheme = type_scheme.constrained_type
-        if isinstance(type_scheme, List) or isinstance(type_scheme, ListOrTuple):
+        if isinstance(type_scheme, (List, ListOrTuple)):
             multiple = True
             type_scheme = type_scheme.elem_type
         if isinstance(type_scheme, click.ParamType):
             used_raw_type = type_scheme
         elif isinstance(type_scheme, ExactEither):
-            used_raw_type = click.Choice(type_scheme.exp_values)
+            used_raw_type = _choice(tuple(type_scheme.exp_values))
         elif isinstance(type_scheme, Exact):
-            used_raw_type = click.Choice(type_scheme.exp_value)
+            used_raw_type = _choice((type_scheme.exp_value,))
         elif isinstance(type_scheme, Tuple):
             used_raw_type = tuple([raw_type(x) for x in type_scheme.elem_types])
         elif isinstance(type_scheme, Any):
@@ -90,6 +207,16 @@ def type_scheme_option(option_name: str, type_scheme: Type, is_flag: bool = Fals
             used_raw_type = str
         else:
             used_raw_type = raw_type(type_scheme)
+        return used_raw_type, multiple
+
+    def func(decorated_func):
+        _type_scheme = __type_scheme
+        cached = _TYPE_SCHEME_RAW_CACHE.get(id(_type_scheme))
+        if cached is not None and cached[0] is _type_scheme:
+            used_raw_type, multiple = cached[1:]
+        else:
+            used_raw_type, multiple = resolve_raw_type(_type_scheme)
+            _TYPE_SCHEME_RAW_CACHE[id(_type_scheme)] = (_type_scheme, used_raw_type, multiple)
         option_args = {
             "type": used_raw_type,
             "callback": None,
@@ -102,24 +229,18 @@ def type_scheme_option(option_name: str, type_scheme: Type, is_flag: bool = Fals
         #    option_args["show_default"] = False
         if not isinstance(option_args["type"], click.ParamType):
             option_args["callback"] = validate(_type_scheme)
-            if not isinstance(option_args["type"], Either(T(tuple), T(str))):
+            if not isinstance(option_args["type"], (tuple, str)):
                 option_args["type"] = raw_type(option_args["type"])
         if callback is not None:
-            if option_args["callback"] is None:
-                option_args["callback"] = lambda ctx, param, value: callback(ctx, param, value)
-            else:
-                old_callback = option_args["callback"]
-                option_args["callback"] = lambda ctx, param, value: callback(ctx, param, old_callback(ctx, param, value))
-            if validate_settings:
-                without_check = option_args["callback"]
-                option_args["callback"] = lambda ctx, param, value: Settings().validate() or without_check(ctx, param, value)
+            option_args["callback"] = _ChainedCallback(option_args["callback"], callback, bool(validate_settings))
         if is_flag:
             option_args["is_flag"] = True
 
         #print(type(option_args["callback"]), option_name, type_scheme)
         opt = None
         if help_text is not None:
-            typecheck(help_text, Str())
+            if __debug__:
+                typecheck(help_text, _STR)
             option_args["help"] = help_text
         if is_flag:
             del(option_args["type"])
@@ -139,9 +260,16 @@ def validate(type_scheme: Type) -> t.Callable[[click.Context, str, t.Any], t.Any
     parameter.
     The validator function expects the type of the value to be the raw type of the type scheme.
 
+    The validator functions are cached per type scheme.
+    The results of the type checks are not cached, as they might depend on the state of the file system.
+
     :param type_scheme: type scheme the validator validates against
     :return: the validator function
     """
+    cached = _VALIDATOR_CACHE.get(id(type_scheme))
+    if cached is not None and cached[0] is type_scheme:
+        return cached[1]
+
     def func(ctx, param, value):
         param = param.human_readable_name
         param = param.replace("-", "")
@@ -149,9 +277,39 @@ def validate(type_scheme: Type) -> t.Callable[[click.Context, str, t.Any], t.Any
         if not res:
             raise click.BadParameter(str(res))
         return value
+    _VALIDATOR_CACHE[id(type_scheme)] = (type_scheme, func)
     return func
 
 
+def _settings_callback(settings_key: str, option_name: str, is_flag: bool,
+                       context: Context, param: click.Option, val) -> t.Any:
+    """
+    Click callback of settings backed options that sets the setting if the option was passed explicitly.
+    It is bound to an option via functools.partial.
+
+    :param settings_key: settings key of the option
+    :param option_name: name of the option
+    :param is_flag: is the option flag like? Errors are only fatal for non flag options
+    :param context: click context
+    :param param: click option
+    :param val: passed value
+    :return: the passed value for flag like options, None otherwise
+    """
+    if (not is_flag or val is not None) and context.get_parameter_source(param.name) != ParameterSource.DEFAULT:
+        try:
+            Settings().set(settings_key, val, validate=False)
+        except SettingsError as err:
+            logging.error("Error while processing the passed value ({val}) of option {opt}: {msg}".format(
+                val=repr(val),
+                opt=option_name,
+                msg=str(err)
+            ))
+            if not is_flag:
+                logging.debug("".join(traceback.format_exception(None, err, err.__traceback__)))
+                exit(1)
+    return val if is_flag else None
+
+
 class CmdOption:
     """
     Represents a command line option.
@@ -171,7 +329,8 @@ class CmdOption:
         :param completion_hints: additional completion hints (dict with keys for each shell)
         :param is_flag: is the option a "--ABC/--no-ABC" flag like option?
         """
-        typecheck(option_name, Str())
+        if __debug__:
+            typecheck(option_name, _STR)
         self.option_name = option_name  # type: str
         """ Name of this option """
         self.settings_key = settings_key  # type: t.Optional[str]
@@ -185,75 +344,76 @@ class CmdOption:
         self.type_scheme = type_scheme  # type: Type
         """ Type scheme with default value """
         if not self.type_scheme:
-            self.type_scheme = Settings().get_type_scheme(settings_key)
+            self.type_scheme = _cached_type_scheme(settings_key)
         #self.callback = lambda a, b: None
         #""" Callback that sets the setting """
         self.callback = None  # type: t.Optional[t.Callable[[click.Context, click.Option, t.Any], None]]
         """ Callback that sets the setting """
-        if type_scheme is not None and not isinstance(type_scheme, click.ParamType):
-            self.callback = lambda a, b: None
         if settings_key is not None and (not isinstance(self.type_scheme, click.ParamType) or isinstance(self.type_scheme, Type)):
-            def callback(context: Context, param: click.Option, val):
-                try:
-                    if context.get_parameter_source(param.name) != ParameterSource.DEFAULT:
-                        Settings().set(settings_key, val, validate=False)
-                except SettingsError as err:
-                    logging.error("Error while processing the passed value ({val}) of option {opt}: {msg}".format(
-                        val=repr(val),
-                        opt=option_name,
-                        msg=str(err)
-                    ))
-                    logging.debug("".join(traceback.format_exception(None, err, err.__traceback__)))
-                    exit(1)
-            self.callback = callback
-        else:
-            self.callback = None
-        self.description = self.type_scheme.description.strip().split("\n")[0]  # type: str
-        """ Description of this option """
-        self.has_description = self.description not in [None, ""]  # type: bool
-        """ Does this option has a description? """
-        if not self.has_description:
-            warnings.warn("Option {} is without documentation.".format(option_name))
-        self.has_default = True  # type: bool
-        """ Does this option has a default value? """
-        self.default = None  # type: t.Any
-        """ Default value of this option """
-        try:
-            self.default = self.type_scheme.get_default()
-        except ValueError:
-            self.has_default = False
-        if settings_key:
-            self.default = Settings()[settings_key]
+            self.callback = functools.partial(_settings_callback, settings_key, option_name, False)
+        self._description = None  # type: t.Optional[str]
+        """ Description of this option, computed on first access """
+        if not (self.type_scheme.description or "").strip():
+            _UNDOCUMENTED.add(option_name)
+        self._has_default = None  # type: t.Optional[bool]
+        """ Does this option has a default value? None if not yet computed """
+        self._default = None  # type: t.Any
+        """ Default value of this option, computed on first access """
         if hasattr(self.type_scheme, "completion_hints") and self.completion_hints is None:
             self.completion_hints = self.type_scheme.completion_hints
-        self.is_flag = is_flag is True or (is_flag is None and type(self.type_scheme) in [Bool, BoolOrNone])  # type: bool
+        self.is_flag = is_flag is True or (is_flag is None and type(self.type_scheme) in (Bool, BoolOrNone))  # type: bool
         """ Is this option flag like? """
         if self.is_flag:
             self.completion_hints = None
             self.short = None
-
-            def callback(context: Context, param, val):
-                if val is not None and context.get_parameter_source(param.name) != ParameterSource.DEFAULT:
-                    try:
-                        Settings().set(settings_key, val, validate=False)
-                    except SettingsError as err:
-                        logging.error("Error while processing the passed value ({val}) of option {opt}: {msg}".format(
-                            val=val,
-                            opt=option_name,
-                            msg=str(err)
-                        ))
-                return val
-            self.callback = callback
+            self.callback = functools.partial(_settings_callback, settings_key, option_name, True)
         self.has_completion_hints = self.completion_hints is not None  # type: bool
         """ Does this option has completion hints? """
         self.has_short = short is not None  # type: bool
         """ Does this option has a short version? """
 
+    @property
+    def description(self) -> str:
+        """ Description of this option (the first line of the type scheme's description) """
+        if self._description is None:
+            self._description = _first_line(self.type_scheme)
+        return self._description
+
+    @property
+    def has_description(self) -> bool:
+        """ Does this option has a description? """
+        return self.description != ""
+
+    @property
+    def default(self) -> t.Any:
+        """ Default value of this option """
+        self._init_default()
+        return self._default
+
+    @property
+    def has_default(self) -> bool:
+        """ Does this option has a default value? """
+        self._init_default()
+        return self._has_default
+
+    def _init_default(self):
+        """
+        Computes the default value on first use, options that are never used don't pay for it.
+        """
+        if self._has_default is not None:
+            return
+        self._has_default = True
+        try:
+            self._default = self.type_scheme.get_default()
+        except ValueError:
+            self._has_default = False
+        if self.settings_key:
+            self._default = Settings()[self.settings_key]
+
     def __lt__(self, other) -> bool:
         """
         Compare by option_name.
         """
-        typecheck(other, CmdOption)
         return self.option_name < other.option_name
 
     def __str__(self) -> str:
@@ -275,28 +435,29 @@ class CmdOption:
         :return: list of CmdOptions
         """
         assert issubclass(registry, AbstractRegistry)
-        typecheck_locals(name_prefix=Str()|E(None))
+        if __debug__:
+            typecheck_locals(name_prefix=_STR_OR_NONE)
         name_prefix = name_prefix if name_prefix is not None else ""
-        ret_list = CmdOptionList()
+        ret_list = []
+        path = registry.settings_key_path
         for plugin in registry.registry:
-            active_key = "{}_active".format("/".join([registry.settings_key_path, plugin]))
             ret_list.append(CmdOption(
                 option_name=name_prefix + plugin,
-                settings_key=active_key
+                settings_key="{}/{}_active".format(path, plugin)
             ))
-            misc_key = "{}_misc".format("/".join(registry.settings_key_path.split("/") + [plugin]))
-            misc = Settings().get_type_scheme(misc_key)
-            typecheck(misc, Dict)
-            for misc_sub_key in misc.data:
+            misc_key = "{}/{}_misc".format(path, plugin)
+            misc = _cached_type_scheme(misc_key)
+            if __debug__:
+                typecheck(misc, Dict)
+            for misc_sub_key, misc_sub in misc.data.items():
                 if misc.is_obsolete(misc_sub_key):
                     continue
-                misc_sub = misc[misc_sub_key]
                 if not isinstance(misc_sub, Dict):
                     ret_list.append(CmdOption(
                         option_name="{}{}_{}".format(name_prefix, plugin, misc_sub_key),
                         settings_key="{}/{}".format(misc_key, misc_sub_key)
                     ))
-        return ret_list
+        return CmdOptionList._from_trusted(ret_list)
 
     @classmethod
     def from_non_plugin_settings(cls, settings_domain: str,
@@ -313,23 +474,24 @@ class CmdOption:
         """
         exclude = exclude or []
         name_prefix = name_prefix or ""
-        typecheck_locals(settings_domain=str, exclude=List(Str()), name_prefix=Str())
+        if __debug__:
+            typecheck_locals(settings_domain=str, exclude=_LIST_STR, name_prefix=_STR)
         domain = Settings().type_scheme
         if settings_domain != "":
-            domain = Settings().get_type_scheme(settings_domain)
+            domain = _cached_type_scheme(settings_domain)
         ret_list = []
         if isinstance(domain, Obsolete):
             return CmdOptionList()
+        exclude = set(exclude)
         for sub_key in domain.data:
-            if domain.is_obsolete(sub_key):
+            if sub_key in exclude or sub_key.endswith(_PLUGIN_KEY_SUFFIXES) or domain.is_obsolete(sub_key):
                 continue
-            if sub_key not in exclude and all(not sub_key.endswith(suf) for suf in ["_active", "_misc"]) \
-               and not isinstance(domain[sub_key], Dict):
+            if not isinstance(domain[sub_key], Dict):
                 ret_list.append(CmdOption(
                     option_name=name_prefix + sub_key,
                     settings_key=settings_domain + "/" + sub_key if settings_domain != "" else sub_key
                 ))
-        return CmdOptionList(*ret_list)
+        return CmdOptionList._from_trusted(ret_list)
 
 
 class CmdOptionList:
@@ -345,9 +507,28 @@ class CmdOptionList:
         """
         self.options = []
         """ Options that build up this list """
+        self._by_name = {}  # type: t.Dict[str, CmdOption]
+        """ First included option for each option name """
+        self._sorted_options = None  # type: t.Optional[t.Tuple[CmdOption]]
+        """ Options sorted by their names, created on demand """
         for option in options:
             self.append(option)
 
+    @classmethod
+    def _from_trusted(cls, options: t.List[CmdOption]) -> 'CmdOptionList':
+        """
+        Creates an instance from a flat list of CmdOptions without type checking each of them.
+
+        :param options: options that this list consists of
+        """
+        ret = cls.__new__(cls)
+        ret.options = list(options)
+        ret._by_name = {}
+        for option in ret.options:
+            ret._by_name.setdefault(option.option_name, option)
+        ret._sorted_options = None
+        return ret
+
     def append(self, options: t.Union[CmdOption, 'CmdOptionList']) -> 'CmdOptionList':
         """
         Appends the passed CmdÖptionList or CmdOption and flattens the resulting list.
@@ -355,13 +536,27 @@ class CmdOptionList:
         :param options: CmdÖptionList or CmdOption
         :return: self
         """
-        typecheck_locals(options=T(CmdOptionList)|T(CmdOption))
+        if __debug__:
+            typecheck_locals(options=_CMD_OPTION_OR_LIST)
+        self._sorted_options = None
         if isinstance(options, CmdOption):
             self.options.append(options)
+            self._by_name.setdefault(options.option_name, options)
         else:
             self.options.extend(options.options)
+            for option in options.options:
+                self._by_name.setdefault(option.option_name, option)
         return self
 
+    def _sorted(self) -> t.Tuple[CmdOption]:
+        """
+        Returns the included options sorted by their names.
+        The result is cached until the next append.
+        """
+        if self._sorted_options is None:
+            self._sorted_options = tuple(sorted(self.options, key=operator.attrgetter("option_name")))
+        return self._sorted_options
+
     def set_short(self, option_name: str, new_short: str) -> 'CmdOptionList':
         """
         Sets the short option name of the included option with the passed name.
@@ -382,12 +577,12 @@ class CmdOptionList:
         :return: found cmd option
         :raises: IndexError if the option doesn't exist
         """
-        if isinstance(key. int):
+        if isinstance(key, int):
             return self.options[key]
-        for option in self.options:
-            if option.option_name == key:
-                return option
-        raise IndexError("No such key {!r}".format(key))
+        try:
+            return self._by_name[key]
+        except KeyError:
+            raise IndexError("No such key {!r}".format(key))
 
     def __iter__(self):
         return self.options.__iter__()
@@ -431,6 +626,10 @@ class CmdOptionList:
         return "\n".join([format_option(x) for x in self.options])
 
 
+_CMD_OPTION_OR_LIST = T(CmdOption) | T(CmdOptionList)
+""" Type scheme for a CmdOption or a CmdOptionList """
+
+
 def cmd_option(option: t.Union[CmdOption, CmdOptionList], name_prefix: str = None,
                validate: bool = None) \
         -> t.Callable[[t.Callable], t.Callable]:
@@ -444,9 +643,11 @@ def cmd_option(option: t.Union[CmdOption, CmdOptionList], name_prefix: str = Non
     :param validate: validate setting or validate only for outer most if None
     :return: click.option(...) like decorator
     """
-    typecheck(option, T(CmdOption) | T(CmdOptionList))
+    if __debug__:
+        typecheck(option, _CMD_OPTION_OR_LIST)
     name_prefix = name_prefix or ""
-    typecheck(name_prefix, Str())
+    if __debug__ and name_prefix:
+        typecheck(name_prefix, _STR)
     if isinstance(option, CmdOption):
         return type_scheme_option(option_name=name_prefix + option.option_name,
                                   type_scheme=option.type_scheme,
@@ -464,11 +665,16 @@ def cmd_option(option: t.Union[CmdOption, CmdOptionList], name_prefix: str = Non
         module = f.__module__
         doc = f.__doc__
         qname = f.__qualname__
-        for i, opt in enumerate(sorted(option.options)):
-            validate = None
-            if isinstance(opt, CmdOption) and i == 0:
-                validate = True
-            f = cmd_option(opt, name_prefix, validate=validate)(f)
+        for i, opt in enumerate(option._sorted()):
+            f = type_scheme_option(option_name=name_prefix + opt.option_name,
+                                   type_scheme=opt.type_scheme,
+                                   short=opt.short,
+                                   is_flag=opt.is_flag,
+                                   callback=opt.callback,
+                                   with_default=opt.has_default,
+                                   default=opt.default,
+                                   validate_settings=i == 0
+                                   )(f)
         f.__name__ = name[0:-2] if name.endswith("_") else name
         f.__qualname__ = qname[0:-2] if qname.endswith("_") else qname
         #f.__args__ = args
@@ -217,6 +217,14 @@ class Settings(metaclass=Singleton):
         Resets the current settings to the defaults.
         """
         self.prefs = copy.deepcopy(self.type_scheme.get_default())
+        self._clear_type_scheme_caches()
+
+    def _clear_type_scheme_caches(self):
+        """
+        Clears the type scheme based caches of the click helper module.
+        """
+        from temci.utils.click_helper import clear_type_scheme_caches
+        clear_type_scheme_caches()
 
     def _validate_settings_dict(self, data: t.Dict[str, t.Any], description: str = None):
         """
@@ -437,6 +445,7 @@ class Settings(metaclass=Singleton):
             tmp_typ[path[-1]] = type_scheme
         else:
             tmp_prefs[path[-1]] = type_scheme.get_default()
+        self._clear_type_scheme_caches()
 
     def get_type_scheme(self, key: str) -> Type:
         """
@@ -471,6 +480,7 @@ class Settings(metaclass=Singleton):
             tmp_typ = tmp_typ[subkey]
         tmp_typ[subkeys[-1]] = modificator(tmp_typ[subkeys[-1]])
         assert isinstance(tmp_typ[subkeys[-1]], Type)
+        self._clear_type_scheme_caches()
 
     def default(self, value: t.Optional[t.Any], key: str):
         """
@@ -0,0 +1,74 @@
+"""
+Tests related to the creation of click options
+"""
+import click
+import pytest
+from click.testing import CliRunner
+
+import temci.utils.click_helper as click_helper
+from temci.utils.click_helper import CmdOption, CmdOptionList, validate, clear_type_scheme_caches, \
+    type_scheme_option
+from temci.utils.typecheck import Str, Description, Default, Exact
+
+
+def test_cmd_option_list_getitem():
+    a = CmdOption("a", type_scheme=Str() // Description("A"))
+    b = CmdOption("b", type_scheme=Str() // Description("B"))
+    options = CmdOptionList(a, CmdOptionList(b))
+    assert options[0] is a
+    assert options[1] is b
+    assert options["b"] is b
+    with pytest.raises(IndexError):
+        options["c"]
+
+
+def test_cmd_option_list_getitem_returns_first_duplicate():
+    a = CmdOption("a", type_scheme=Str() // Description("A"))
+    other_a = CmdOption("a", type_scheme=Str() // Description("Other A"))
+    assert CmdOptionList(a, other_a)["a"] is a
+
+
+def test_clear_type_scheme_caches_drops_validators():
+    type_scheme = Str() // Description("A")
+    validator = validate(type_scheme)
+    assert validate(type_scheme) is validator
+    clear_type_scheme_caches()
+    assert validate(type_scheme) is not validator
+
+
+def test_set_short_does_not_affect_other_lists():
+    a = CmdOption.from_non_plugin_settings("run/cpuset", name_prefix="cpuset_")
+    b = CmdOption.from_non_plugin_settings("run/cpuset", name_prefix="cpuset_")
+    a.set_short("cpuset_active", "Z")
+    assert a["cpuset_active"].short == "Z"
+    assert b["cpuset_active"].short is None
+
+
+def test_undocumented_option_is_reported(monkeypatch):
+    monkeypatch.setattr(click_helper, "_UNDOCUMENTED", set())
+    CmdOption("zzz_undoc", type_scheme=Str() // Default("x") // Description(" "))
+    CmdOption("zzz_doc", type_scheme=Str() // Default("x") // Description("Documented"))
+    assert click_helper._UNDOCUMENTED == {"zzz_undoc"}
+    with pytest.warns(UserWarning, match="zzz_undoc"):
+        click_helper._warn_about_undocumented_options()
+
+
+def test_exact_option_accepts_its_value():
+    @click.command()
+    @type_scheme_option("mode", Exact("fast") // Description("Mode"), callback=None, with_default=False)
+    def cmd(mode):
+        click.echo(mode)
+
+    result = CliRunner().invoke(cmd, ["--mode", "fast"])
+    assert result.exit_code == 0
+    assert result.output == "fast\n"
+    assert CliRunner().invoke(cmd, ["--mode", "f"]).exit_code != 0
+
+
+def test_exact_option_with_unhashable_value():
+    @click.command()
+    @type_scheme_option("x", Exact([1]) // Description("d"), callback=None)
+    def cmd(x):
+        pass
+
+    assert isinstance(cmd.params[0].type, click.Choice)